@@ -7,94 +7,325 @@ Provides two main tools:
 """
 
 import asyncio
+import atexit
 import base64
+import binascii
+import collections
+import csv
+import fnmatch
+import functools
+import hashlib
+import io
+import json
+import mimetypes
+import mmap
 import os
+import re
+import shutil
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, Literal
+from stat import S_ISREG
+from typing import Literal
 
 import docker
-
-from fastmcp import FastMCP
+from fastmcp import Context, FastMCP
 
 # Create the FastMCP server
 mcp = FastMCP("R-Server MCP")
 
-# Global variable to store mounted directory
-MOUNTED_DIRECTORY = None
+# Mounted directory, plus its string forms precomputed for R script templates
+_WD_CACHE = {"path": None, "base": None, "workspace": None}
+
+# R code run once when the worker starts: preload the heavy libraries, then
+# serve length-prefixed requests from stdin until it is closed. Each request
+# is evaluated like a top-level Rscript file and answered with its stdout,
+# a separator marker, its stderr and an end marker carrying the status.
+R_WORKER_BOOTSTRAP = r"""
+for (p in c("ggplot2", "cowplot", "readxl")) {
+  try(suppressPackageStartupMessages(library(p, character.only = TRUE)), silent = TRUE)
+}
+.rmcp_token <- "__TOKEN__"
+# q()/quit() in request code ends just that request, with its exit status
+.rmcp_quit <- function(save = "default", status = 0, runLast = TRUE) {
+  stop(structure(class = c("rmcp_quit", "condition"),
+                 list(message = "quit", call = NULL, status = as.integer(status))))
+}
+.rmcp_run <- function(code) {
+  out <- character()
+  err <- character()
+  status <- 0L
+  # Session state restored afterwards so requests do not leak into each other
+  opts_before <- options()
+  search_before <- search()
+  env_before <- Sys.getenv()
+  out_con <- textConnection("out", "w", local = TRUE)
+  err_con <- textConnection("err", "w", local = TRUE)
+  sink(out_con)
+  sink(err_con, type = "message")
+  tryCatch(
+    withCallingHandlers({
+      env <- new.env(parent = globalenv())
+      env$q <- env$quit <- .rmcp_quit
+      for (expr in parse(text = code, keep.source = FALSE)) {
+        res <- withVisible(eval(expr, env))
+        if (res$visible) print(res$value)
+      }
+    }, warning = function(w) {
+      cat("Warning message:\n", conditionMessage(w), "\n", sep = "", file = stderr())
+      invokeRestart("muffleWarning")
+    }),
+    rmcp_quit = function(cnd) {
+      status <<- cnd$status
+    },
+    error = function(e) {
+      cat("Error: ", conditionMessage(e), "\n", sep = "", file = stderr())
+      status <<- 1L
+    }
+  )
+  while (sink.number() > 0) sink()
+  sink(type = "message")
+  close(out_con)
+  close(err_con)
+  graphics.off()
+  for (entry in setdiff(search(), search_before)) {
+    try(detach(entry, character.only = TRUE), silent = TRUE)
+  }
+  opts_added <- setdiff(names(options()), names(opts_before))
+  try(options(c(opts_before, setNames(vector("list", length(opts_added)), opts_added))), silent = TRUE)
+  env_added <- setdiff(names(Sys.getenv()), names(env_before))
+  if (length(env_added) > 0) Sys.unsetenv(env_added)
+  try(do.call(Sys.setenv, as.list(env_before)), silent = TRUE)
+  cat(paste0(out, "\n"), sep = "")
+  cat("<<<RMCP_ERR ", .rmcp_token, ">>>\n", sep = "")
+  cat(paste0(err, "\n"), sep = "")
+  cat("<<<RMCP_END ", .rmcp_token, " ", status, ">>>\n", sep = "")
+  flush(stdout())
+}
+.rmcp_stdin <- file("stdin", "rb")
+cat("<<<RMCP_READY ", .rmcp_token, ">>>\n", sep = "")
+flush(stdout())
+repeat {
+  n <- readBin(.rmcp_stdin, "integer", 1L, size = 4L, endian = "little")
+  if (length(n) == 0L) break
+  code <- rawToChar(readBin(.rmcp_stdin, "raw", n))
+  Encoding(code) <- "UTF-8"
+  .rmcp_run(code)
+}
+"""
+
+
+# Seconds a fresh worker may take to load its libraries and report ready;
+# this is separate from, and not charged to, the timeout of each request
+R_WORKER_STARTUP_TIMEOUT = 120
+
+
+class RWorker:
+    """
+    A long-lived Rscript process that evaluates R code sent over stdin.
+
+    Keeping one interpreter resident avoids paying R startup and library
+    loading on every tool call. Requests are serialized with a lock; a
+    timed-out or crashed worker is killed and restarted on the next call.
+    """
+
+    def __init__(self):
+        self._proc = None
+        self._ready = False
+        self._token = ""
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Launch the worker process if it is not already running."""
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        self._token = uuid.uuid4().hex
+        self._ready = False
+        self._proc = subprocess.Popen(
+            ["Rscript", "-e", R_WORKER_BOOTSTRAP.replace("__TOKEN__", self._token)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def stop(self):
+        """Terminate the worker process."""
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+    def reset(self):
+        """Stop the worker once it is idle, so the next call starts a fresh one."""
+        with self._lock:
+            self.stop()
+
+    def eval(self, code: str, timeout: int = 60) -> tuple[str, str, int]:
+        """
+        Evaluate R code in the worker.
+
+        Returns:
+            Tuple of (stdout, stderr, return_code)
+        """
+        with self._lock:
+            try:
+                self.start()
+            except FileNotFoundError:
+                return "", "R is not installed or not in PATH. Please install R and ensure 'Rscript' is available.", -1
+
+            proc = self._proc
+            if not self._ready:
+                timer = threading.Timer(R_WORKER_STARTUP_TIMEOUT, proc.kill)
+                timer.start()
+                try:
+                    self._read_until(f"<<<RMCP_READY {self._token}>>>")
+                    self._ready = True
+                except (OSError, EOFError):
+                    self.stop()
+                    return "", "R worker process failed to start", -1
+                finally:
+                    timer.cancel()
+
+            timed_out = threading.Event()
+
+            def _kill():
+                timed_out.set()
+                proc.kill()
+
+            timer = threading.Timer(timeout, _kill)
+            timer.start()
+            try:
+                payload = code.encode("utf-8")
+                proc.stdin.write(struct.pack("<i", len(payload)) + payload)
+                proc.stdin.flush()
+                stdout = self._read_until(f"<<<RMCP_ERR {self._token}>>>")
+                stderr = self._read_until(f"<<<RMCP_END {self._token} ")
+            except (OSError, EOFError):
+                self.stop()
+                if timed_out.is_set():
+                    return "", f"Script execution timed out after {timeout} seconds", -1
+                return "", "R worker process exited unexpectedly", -1
+            finally:
+                timer.cancel()
+
+            return "".join(stdout[:-1]), "".join(stderr[:-1]), int(stderr[-1])
+
+    def _read_until(self, marker: str) -> list[str]:
+        """Read output lines up to a marker line; the last item is the marker's tail."""
+        lines = []
+        while True:
+            line = self._proc.stdout.readline()
+            if not line:
+                raise EOFError("R worker closed its output")
+            text = line.decode("utf-8", errors="replace").rstrip("\r\n")
+            if text.startswith(marker):
+                lines.append(text[len(marker):].rstrip(">"))
+                return lines
+            lines.append(text + "\n")
+
+
+R_WORKER = RWorker()
+
+def r_vector(values: list[str]) -> str:
+    """Format Python strings as an R character vector literal."""
+    return "c(" + ", ".join(f'"{v}"' for v in values) + ")"
+
+def check_r_packages(packages: list[str], timeout: int = 15) -> dict[str, str]:
+    """
+    Check which R packages are installed with a single R evaluation.
+    
+    Returns:
+        Dictionary mapping each package name to "OK" or "MISSING"
+    """
+    check_script = f"""
+    for (p in {r_vector(packages)}) {{
+      cat(p, if (requireNamespace(p, quietly = TRUE)) "OK" else "MISSING", "\\n")
+    }}
+    """
+    stdout, stderr, returncode = R_WORKER.eval(check_script, timeout=timeout)
+    if returncode != 0:
+        raise RuntimeError(stderr.strip() or "R package check failed")
+    
+    status = {}
+    for line in stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] in packages:
+            status[parts[0]] = parts[1]
+    return status
 
 # Check and install R packages automatically
 def ensure_r_packages():
     """Check if required R packages are installed and install them if missing."""
-    required_packages = ["ggplot2", "cowplot", "readxl", "writexl", "dplyr", "tidyr"]
+    required_packages = ["ggplot2", "cowplot", "readxl", "writexl", "dplyr", "tidyr", "jsonlite"]
     
     print("Checking R package dependencies...", file=sys.stderr)
     
-    for package in required_packages:
-        check_script = f"""
-        if (!requireNamespace("{package}", quietly = TRUE)) {{
-          cat("MISSING\\n")
-        }} else {{
-          cat("OK\\n")
-        }}
-        """
+    try:
+        status = check_r_packages(required_packages, timeout=30)
+        missing = [p for p in required_packages if status.get(p) != "OK"]
         
-        try:
-            result = subprocess.run(
-                ["Rscript", "-e", check_script],
+        for package in required_packages:
+            if package not in missing:
+                print(f"✓ {package} already available", file=sys.stderr)
+        
+        if missing:
+            print(f"Installing R packages: {', '.join(missing)}...", file=sys.stderr)
+            install_script = f"""
+            pkgs <- {r_vector(missing)}
+            install.packages(pkgs, repos="https://cran.r-project.org", quiet=TRUE,
+                             Ncpus=parallel::detectCores())
+            for (p in pkgs) {{
+              cat(p, if (requireNamespace(p, quietly = TRUE)) "SUCCESS" else "FAILED", "\\n")
+            }}
+            """
+            
+            install_result = subprocess.run(
+                ["Rscript", "-e", install_script],
                 capture_output=True,
                 text=True,
-                timeout=5
+                timeout=120 * len(missing)  # Give more time for installation
             )
             
-            if "MISSING" in result.stdout:
-                print(f"Installing R package: {package}...", file=sys.stderr)
-                install_script = f"""
-                install.packages("{package}", repos="https://cran.r-project.org", quiet=TRUE)
-                if (requireNamespace("{package}", quietly = TRUE)) {{
-                  cat("SUCCESS\\n")
-                }} else {{
-                  cat("FAILED\\n")
-                }}
-                """
-                
-                install_result = subprocess.run(
-                    ["Rscript", "-e", install_script],
-                    capture_output=True,
-                    text=True,
-                    timeout=120  # Give more time for installation
-                )
-                
-                if "SUCCESS" in install_result.stdout:
+            installed = {
+                parts[0] for parts in map(str.split, install_result.stdout.splitlines())
+                if len(parts) == 2 and parts[1] == "SUCCESS"
+            }
+            for package in missing:
+                if package in installed:
                     print(f"✓ Successfully installed {package}", file=sys.stderr)
                 else:
                     print(f"✗ Failed to install {package}: {install_result.stderr}", file=sys.stderr)
-            else:
-                print(f"✓ {package} already available", file=sys.stderr)
                 
-        except subprocess.TimeoutExpired:
-            print(f"✗ Timeout checking/installing {package}", file=sys.stderr)
-        except Exception as e:
-            print(f"✗ Error with {package}: {e}", file=sys.stderr)
+    except subprocess.TimeoutExpired:
+        print("✗ Timeout checking/installing R packages", file=sys.stderr)
+    except Exception as e:
+        print(f"✗ Error checking R packages: {e}", file=sys.stderr)
     
     print("R package check completed.", file=sys.stderr)
 
 # Ensure packages are installed on import (with shorter timeout for startup)
 try:
     # Quickly check critical packages only at startup
-    critical_packages = ["ggplot2", "cowplot"]  # Most important ones
+    critical_packages = ["ggplot2", "cowplot", "jsonlite"]  # Most important ones
     
     print("Quick R package check...", file=sys.stderr)
-    for pkg in critical_packages:
-        check_script = f'if (!requireNamespace("{pkg}", quietly = TRUE)) cat("MISSING\\n") else cat("OK\\n")'
-        result = subprocess.run(["Rscript", "-e", check_script], capture_output=True, text=True, timeout=3)
-        
-        if "MISSING" in result.stdout:
-            print(f"Installing critical package: {pkg}...", file=sys.stderr)
-            install_script = f'install.packages("{pkg}", repos="https://cran.r-project.org", quiet=TRUE)'
-            subprocess.run(["Rscript", "-e", install_script], timeout=60)
+    R_WORKER.start()
+    status = check_r_packages(critical_packages, timeout=30)
+    missing = [p for p in critical_packages if status.get(p) != "OK"]
+    
+    if missing:
+        print(f"Installing critical packages: {', '.join(missing)}...", file=sys.stderr)
+        install_script = f'install.packages({r_vector(missing)}, repos="https://cran.r-project.org", quiet=TRUE, Ncpus=parallel::detectCores())'
+        subprocess.run(["Rscript", "-e", install_script], timeout=60 * len(missing))
     
     print("✓ Critical R packages ready", file=sys.stderr)
 except Exception as e:
@@ -103,6 +334,19 @@ except Exception as e:
 # Output formats supported
 OutputFormat = Literal["png", "jpeg", "pdf", "svg"]
 
+# Formats saved to the mounted workspace and returned by path, not base64.
+# They go to the RENDERS_DIR subdirectory of r_workspace, which keeps only
+# the newest RENDER_FILES_MAX files
+FILE_OUTPUT_FORMATS = {"pdf", "svg"}
+RENDERS_DIR = "renders"
+RENDER_FILES_MAX = 64
+
+# Characters replaced in uploaded filenames
+_UNSAFE_FN_RE = re.compile(r'[<>:"|?*]')
+
+# Regex metacharacters; package patterns without them are matched as plain text
+_REGEX_META_RE = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
 @mcp.tool
 def mount_directory(
     directory_path: str
@@ -116,10 +360,6 @@ def mount_directory(
     Returns:
         Dictionary with mount status and details
     """
-    global MOUNTED_DIRECTORY
-    from pathlib import Path
-    import os
-    
     try:
         # Convert to Path object
         mount_path = Path(directory_path).resolve()
@@ -155,16 +395,23 @@ def mount_directory(
                 "details": f"Cannot read: {mount_path}"
             }
         
-        # Set the mounted directory
-        MOUNTED_DIRECTORY = mount_path
-        
         # Create r_workspace subdirectory if it doesn't exist
         workspace_path = mount_path / "r_workspace"
         workspace_path.mkdir(exist_ok=True)
         
-        # List some files to confirm
-        files = list(mount_path.glob("*"))[:5]
-        file_names = [f.name for f in files]
+        # Set the mounted directory
+        _WD_CACHE["path"] = mount_path
+        _WD_CACHE["base"] = str(mount_path)
+        _WD_CACHE["workspace"] = str(workspace_path)
+        
+        # List some files to confirm, counting all entries in the same pass
+        file_names = []
+        total_files = 0
+        with os.scandir(mount_path) as entries:
+            for entry in entries:
+                total_files += 1
+                if len(file_names) < 5:
+                    file_names.append(entry.name)
         
         print(f"✓ Mounted directory: {mount_path}", file=sys.stderr)
         
@@ -174,7 +421,7 @@ def mount_directory(
             "mounted_path": str(mount_path),
             "workspace_path": str(workspace_path),
             "sample_files": file_names,
-            "total_files": len(list(mount_path.glob("*"))),
+            "total_files": total_files,
             "details": f"R operations will now use this directory as base path"
         }
         
@@ -187,12 +434,43 @@ def mount_directory(
 
 def get_working_directory():
     """Get the current working directory for R operations."""
-    if MOUNTED_DIRECTORY:
-        return MOUNTED_DIRECTORY
-    return Path.cwd()
+    return _WD_CACHE["path"] or Path.cwd()
+
+def get_working_directory_str() -> str:
+    """Get the working directory for R operations as a string."""
+    return _WD_CACHE["base"] or str(Path.cwd())
+
+def get_workspace_directory_str() -> str:
+    """Get the r_workspace directory for R operations as a string."""
+    return _WD_CACHE["workspace"] or str(Path.cwd() / "r_workspace")
+
+# Base64 characters decoded per step when writing uploads (multiple of 4)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+def write_base64_file(file_content: str, file_path: Path) -> int:
+    """
+    Decode base64 text into a file chunk by chunk.
+    
+    Returns:
+        Number of bytes written
+    """
+    written = 0
+    pending = ""
+    with open(file_path, "wb") as f:
+        for i in range(0, len(file_content), UPLOAD_CHUNK_SIZE):
+            # Drop line breaks and carry any partial 4-character group forward
+            chunk = pending + "".join(file_content[i:i + UPLOAD_CHUNK_SIZE].split())
+            cut = len(chunk) - len(chunk) % 4
+            pending = chunk[cut:]
+            data = base64.b64decode(chunk[:cut], validate=True)
+            f.write(data)
+            written += len(data)
+    if pending:
+        raise binascii.Error("Incorrect padding")
+    return written
 
 @mcp.tool
-def upload_file(
+async def upload_file(
     file_content: str,
     filename: str,
     overwrite: bool = False
@@ -208,11 +486,6 @@ def upload_file(
     Returns:
         Dictionary with upload status and file information
     """
-    import os
-    import base64
-    import re
-    from pathlib import Path
-    
     # Validate filename (security)
     if not filename or ".." in filename or "/" in filename or "\\" in filename:
         return {
@@ -223,7 +496,7 @@ def upload_file(
         }
     
     # Sanitize filename
-    filename = re.sub(r'[<>:"|?*]', '_', filename)
+    filename = _UNSAFE_FN_RE.sub('_', filename)
     
     # Check file extension (whitelist)
     allowed_extensions = {'.xlsx', '.xls', '.csv', '.txt', '.tsv', '.json'}
@@ -238,19 +511,8 @@ def upload_file(
         }
     
     try:
-        # Decode base64 content
-        try:
-            file_data = base64.b64decode(file_content)
-        except Exception as e:
-            return {
-                "success": False,
-                "filename": filename,
-                "message": "Invalid base64 content",
-                "details": str(e)
-            }
-        
-        # Check file size (10MB limit)
-        file_size = len(file_data)
+        # Check file size (10MB limit) from the encoded length, before decoding
+        file_size = (len(file_content) - file_content.count("\n")) * 3 // 4
         max_size = 10 * 1024 * 1024  # 10MB
         
         if file_size > max_size:
@@ -278,8 +540,22 @@ def upload_file(
                 "details": f"Existing file size: {file_path.stat().st_size} bytes"
             }
         
-        # Write file
-        file_path.write_bytes(file_data)
+        # Decode into a partial file, then move it into place
+        part_path = r_work_dir / f".{filename}.{uuid.uuid4().hex}.part"
+        try:
+            try:
+                file_size = await asyncio.to_thread(write_base64_file, file_content, part_path)
+            except (binascii.Error, ValueError) as e:
+                return {
+                    "success": False,
+                    "filename": filename,
+                    "message": "Invalid base64 content",
+                    "details": str(e)
+                }
+            os.replace(part_path, file_path)
+        finally:
+            # No-op once the file has been moved into place
+            part_path.unlink(missing_ok=True)
         
         # Verify file was written
         if not file_path.exists():
@@ -317,27 +593,24 @@ def upload_file(
 @mcp.tool
 def list_files(
     pattern: str = "*",
-    file_type: str = "all"
+    file_type: str = "all",
+    details: bool = True
 ) -> dict:
     """
     List files in the R working directory.
     
     Args:
-        pattern: File pattern to match (e.g., "*.xlsx")
+        pattern: File pattern to match (e.g., "*.xlsx", "r_workspace/*.csv", "**/*.R")
         file_type: Filter by file type (all, excel, csv, text)
+        details: Include size and modification time (skip for faster listing)
     
     Returns:
         Dictionary with file list and details
     """
-    from pathlib import Path
-    import glob
-    import os
-    from datetime import datetime
-    
     try:
         # Check both mounted directory and r_workspace
         base_dir = get_working_directory()
-        search_dirs = [base_dir, base_dir / "r_workspace"]
+        search_dirs = [(base_dir, "current"), (base_dir / "r_workspace", "workspace")]
         all_files = []
         
         type_patterns = {
@@ -349,29 +622,60 @@ def list_files(
         
         patterns = type_patterns.get(file_type, [pattern])
         
-        for search_dir in search_dirs:
-            if search_dir.exists():
+        # Patterns with a directory part or "**" need Path.glob; plain name
+        # patterns are matched in one directory pass per search dir
+        use_glob = any("/" in pat or os.sep in pat or "**" in pat for pat in patterns)
+        
+        for search_dir, location in search_dirs:
+            matches = []
+            if use_glob:
+                if not search_dir.is_dir():
+                    continue
                 for pat in patterns:
-                    files = list(search_dir.glob(pat))
-                    for file_path in files:
+                    for file_path in search_dir.glob(pat):
                         if file_path.is_file():
-                            stat = file_path.stat()
-                            all_files.append({
-                                "name": file_path.name,
-                                "path": str(file_path),
-                                "size_bytes": stat.st_size,
-                                "size_mb": round(stat.st_size / (1024*1024), 2),
-                                "modified": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
-                                "extension": file_path.suffix,
-                                "directory": "workspace" if "r_workspace" in str(file_path) else "current"
-                            })
+                            file_location = "workspace" if "r_workspace" in file_path.parts else location
+                            matches.append((file_path.name, str(file_path), file_path.stat, file_location))
+            else:
+                try:
+                    entries = os.scandir(search_dir)
+                except FileNotFoundError:
+                    continue
+                # DirEntry caches its stat result
+                with entries:
+                    for entry in entries:
+                        if entry.is_file() and any(fnmatch.fnmatch(entry.name, pat) for pat in patterns):
+                            matches.append((entry.name, entry.path, entry.stat, location))
+            
+            for name, path, get_stat, file_location in matches:
+                if not details:
+                    all_files.append({
+                        "name": name,
+                        "path": path,
+                        "extension": os.path.splitext(name)[1],
+                        "directory": file_location
+                    })
+                    continue
+                stat = get_stat()
+                all_files.append({
+                    "name": name,
+                    "path": path,
+                    "size_bytes": stat.st_size,
+                    "size_mb": round(stat.st_size / (1024*1024), 2),
+                    "modified": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+                    "extension": os.path.splitext(name)[1],
+                    "directory": file_location
+                })
         
         # Remove duplicates and sort
         unique_files = {}
         for f in all_files:
             unique_files[f["name"]] = f
         
-        sorted_files = sorted(unique_files.values(), key=lambda x: x["modified"], reverse=True)
+        if details:
+            sorted_files = sorted(unique_files.values(), key=lambda x: x["modified"], reverse=True)
+        else:
+            sorted_files = sorted(unique_files.values(), key=lambda x: x["name"])
         
         return {
             "success": True,
@@ -390,8 +694,42 @@ def list_files(
             "message": f"Error listing files: {str(e)}"
         }
 
+@functools.lru_cache(maxsize=256)
+def _excel_meta(path_str: str, mtime_ns: int, size: int) -> tuple:
+    """
+    Read the sheet names and first-sheet shape of an Excel file with R.
+    
+    mtime_ns and size only serve as cache key parts, so editing the file
+    invalidates its cached entry.
+    
+    Returns:
+        Tuple of (sheets, rows, columns, column_names); missing fields are None
+    """
+    r_script = f'''
+    library(readxl)
+    file_path <- "{path_str}"
+    sheets <- excel_sheets(file_path)
+    info <- list(sheets = I(sheets))
+    
+    # Get first sheet info
+    if (length(sheets) > 0) {{
+      data <- read_excel(file_path, sheet = 1)
+      info$rows <- nrow(data)
+      info$cols <- ncol(data)
+      info$colnames <- I(names(data))
+    }}
+    cat(jsonlite::toJSON(info, auto_unbox = TRUE))
+    '''
+    
+    output, stderr, returncode = R_WORKER.eval(r_script, timeout=10)
+    if returncode != 0:
+        raise RuntimeError(stderr)
+    
+    info = json.loads(output)
+    return info.get("sheets"), info.get("rows"), info.get("cols"), info.get("colnames")
+
 @mcp.tool
-def file_info(filename: str) -> dict:
+async def file_info(filename: str) -> dict:
     """
     Get detailed information about a specific file.
     
@@ -401,10 +739,6 @@ def file_info(filename: str) -> dict:
     Returns:
         Dictionary with detailed file information
     """
-    from pathlib import Path
-    import mimetypes
-    from datetime import datetime
-    
     try:
         # Search in multiple locations
         base_dir = get_working_directory()
@@ -415,9 +749,14 @@ def file_info(filename: str) -> dict:
         ]
         search_paths = [p for p in search_paths if p]  # Remove None
         
+        # One stat per candidate; the result is reused below
         file_path = None
         for path in search_paths:
-            if path.exists() and path.is_file():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if S_ISREG(stat.st_mode):
                 file_path = path
                 break
         
@@ -429,8 +768,6 @@ def file_info(filename: str) -> dict:
                 "details": f"Searched in: current directory, r_workspace"
             }
         
-        # Get file stats
-        stat = file_path.stat()
         mime_type, _ = mimetypes.guess_type(str(file_path))
         
         # Try to get additional info for data files
@@ -438,41 +775,17 @@ def file_info(filename: str) -> dict:
         
         if file_path.suffix.lower() in ['.xlsx', '.xls']:
             try:
-                # Get Excel sheet info
-                r_script = f'''
-                library(readxl)
-                file_path <- "{file_path}"
-                sheets <- excel_sheets(file_path)
-                cat("SHEETS:", paste(sheets, collapse=","), "\\n")
-                
-                # Get first sheet info
-                if (length(sheets) > 0) {{
-                  data <- read_excel(file_path, sheet = 1)
-                  cat("ROWS:", nrow(data), "\\n")
-                  cat("COLS:", ncol(data), "\\n")
-                  cat("COLNAMES:", paste(names(data), collapse=","), "\\n")
-                }}
-                '''
-                
-                result = subprocess.run(
-                    ["Rscript", "-e", r_script],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
+                sheets, rows, cols, colnames = await asyncio.to_thread(
+                    _excel_meta, str(file_path), stat.st_mtime_ns, stat.st_size
                 )
-                
-                if result.returncode == 0:
-                    output = result.stdout
-                    if "SHEETS:" in output:
-                        sheets = output.split("SHEETS:")[1].split("\\n")[0].strip()
-                        additional_info["excel_sheets"] = sheets.split(",") if sheets else []
-                    if "ROWS:" in output:
-                        additional_info["rows"] = output.split("ROWS:")[1].split("\\n")[0].strip()
-                    if "COLS:" in output:
-                        additional_info["columns"] = output.split("COLS:")[1].split("\\n")[0].strip()
-                    if "COLNAMES:" in output:
-                        cols = output.split("COLNAMES:")[1].split("\\n")[0].strip()
-                        additional_info["column_names"] = cols.split(",") if cols else []
+                if sheets is not None:
+                    additional_info["excel_sheets"] = sheets
+                if rows is not None:
+                    additional_info["rows"] = rows
+                if cols is not None:
+                    additional_info["columns"] = cols
+                if colnames is not None:
+                    additional_info["column_names"] = colnames
                         
             except Exception:
                 additional_info["excel_info"] = "Could not read Excel file details"
@@ -500,100 +813,419 @@ def file_info(filename: str) -> dict:
             "details": ""
         }
 
-def execute_r_script_docker(r_code: str, host_temp_dir: str = None) -> tuple[str, str, int]:
+# Docker client shared across calls, created on first Docker execution
+_DOCKER_CLIENT = None
+
+def _get_docker_client():
+    """Get the shared Docker client, pulling the R image on first use."""
+    global _DOCKER_CLIENT
+    if _DOCKER_CLIENT is None:
+        client = docker.from_env()
+        try:
+            client.images.get("r-base:latest")
+        except docker.errors.ImageNotFound:
+            print("Pulling Docker image r-base:latest...", file=sys.stderr)
+            client.images.pull("r-base", tag="latest")
+        _DOCKER_CLIENT = client
+    return _DOCKER_CLIENT
+
+# Long-lived R container; the mounted directory (or, when nothing is mounted,
+# a private temporary directory) is bound to DOCKER_WORK_DIR in it and
+# per-call scripts live in its DOCKER_SCRATCH_DIR subdirectory
+DOCKER_WORK_DIR = "/work"
+DOCKER_SCRATCH_DIR = ".scripts"
+_R_CONTAINER = None
+_R_CONTAINER_DIR = None
+_R_CONTAINER_LOCK = threading.RLock()
+_DOCKER_PRIVATE_DIR = None
+
+def _get_docker_host_dir() -> str:
+    """Get the host directory bound into the R container."""
+    global _DOCKER_PRIVATE_DIR
+    if _WD_CACHE["base"]:
+        return _WD_CACHE["base"]
+    # Never expose the server's own working directory to container code
+    with _R_CONTAINER_LOCK:
+        if _DOCKER_PRIVATE_DIR is None:
+            _DOCKER_PRIVATE_DIR = tempfile.mkdtemp(prefix="rmcp-docker-")
+        return _DOCKER_PRIVATE_DIR
+
+def _get_docker_scratch_dir() -> Path:
+    """Get the host directory for per-call scripts and outputs of the R container."""
+    scratch_dir = Path(_get_docker_host_dir()) / DOCKER_SCRATCH_DIR
+    scratch_dir.mkdir(exist_ok=True)
+    return scratch_dir
+
+def _get_r_container():
+    """Get the warm R container, (re)starting it when the bound directory changes."""
+    global _R_CONTAINER, _R_CONTAINER_DIR
+    base_dir = _get_docker_host_dir()
+    with _R_CONTAINER_LOCK:
+        if _R_CONTAINER is not None and _R_CONTAINER_DIR != base_dir:
+            _stop_r_container()
+        if _R_CONTAINER is None:
+            client = _get_docker_client()
+            name = f"rmcp-r-worker-{os.getpid()}"
+            # Remove a container left behind by an earlier failure, which
+            # would otherwise make the name conflict
+            try:
+                client.containers.get(name).remove(force=True)
+            except docker.errors.NotFound:
+                pass
+            _R_CONTAINER = client.containers.run(
+                "r-base:latest",
+                "tail -f /dev/null",
+                detach=True,
+                name=name,
+                volumes={base_dir: {"bind": DOCKER_WORK_DIR, "mode": "rw"}},
+                working_dir=DOCKER_WORK_DIR,
+                remove=False
+            )
+            _R_CONTAINER_DIR = base_dir
+        return _R_CONTAINER
+
+def _stop_r_container():
+    """Stop and remove the warm R container."""
+    global _R_CONTAINER
+    container, _R_CONTAINER = _R_CONTAINER, None
+    if container is not None:
+        try:
+            container.remove(force=True)
+        except docker.errors.DockerException:
+            pass
+
+def _remove_docker_private_dir():
+    """Delete the private directory bound into the R container, if one was made."""
+    if _DOCKER_PRIVATE_DIR is not None:
+        shutil.rmtree(_DOCKER_PRIVATE_DIR, ignore_errors=True)
+
+atexit.register(_stop_r_container)
+atexit.register(_remove_docker_private_dir)
+
+def _discard_dead_r_container(container):
+    """Remove the warm R container if it is no longer running, so the next call starts a fresh one."""
+    if container is None:
+        return
+    try:
+        container.reload()
+        if container.status == "running":
+            return
+    except docker.errors.DockerException:
+        pass
+    with _R_CONTAINER_LOCK:
+        if _R_CONTAINER is container:
+            _stop_r_container()
+
+def execute_r_script_docker(r_code: str, timeout: int = 60) -> tuple[str, str, int]:
     """
     Execute R script in a Docker container for security and isolation.
     
+    The script is written to the directory that the warm R container has
+    bound at DOCKER_WORK_DIR, and run there with exec, so no container or
+    bind mount is created per call.
+    
     Args:
         r_code: R code to execute
-        host_temp_dir: Host directory to mount (for file I/O)
+        timeout: Maximum execution time in seconds
     
     Returns:
         Tuple of (stdout, stderr, return_code)
     """
+    script_name = f"{uuid.uuid4().hex}.R"
+    script_file = None
+    container = None
     
     try:
-        client = docker.from_env()
+        script_file = _get_docker_scratch_dir() / script_name
+        container = _get_r_container()
+        script_file.write_text(r_code)
         
-        # Use provided temp dir or create one
-        if host_temp_dir:
-            host_temp_path = Path(host_temp_dir)
-            script_file = host_temp_path / "script.R"
-            script_file.write_text(r_code)
-        else:
-            # Create a temporary directory on the host
-            with tempfile.TemporaryDirectory() as temp_dir:
-                host_temp_path = Path(temp_dir)
-                script_file = host_temp_path / "script.R"
-                script_file.write_text(r_code)
-                return _run_docker_container(client, str(host_temp_path))
-        
-        return _run_docker_container(client, str(host_temp_path))
+        # coreutils timeout stops a runaway script (exit status 124)
+        exit_code, (stdout, stderr) = container.exec_run(
+            ["timeout", "-k", "5", str(timeout),
+             "Rscript", f"{DOCKER_WORK_DIR}/{DOCKER_SCRATCH_DIR}/{script_name}"],
+            workdir=DOCKER_WORK_DIR,
+            demux=True
+        )
+        if exit_code == 124:
+            return "", f"Script execution timed out after {timeout} seconds", -1
+        return (
+            stdout.decode('utf-8', errors='replace') if stdout else "",
+            stderr.decode('utf-8', errors='replace') if stderr else "",
+            exit_code
+        )
             
-    except docker.errors.ImageNotFound:
-        raise RuntimeError("Docker image 'r-base:latest' not found. Please pull it with: docker pull r-base")
     except docker.errors.DockerException as e:
+        # Other calls may be running in the same container; only a dead
+        # container is replaced
+        _discard_dead_r_container(container)
         raise RuntimeError(f"Docker execution failed: {str(e)}")
     except Exception as e:
         raise RuntimeError(f"Unexpected error during Docker execution: {str(e)}")
+    finally:
+        if script_file is not None:
+            script_file.unlink(missing_ok=True)
 
-def _run_docker_container(client, host_temp_path: str) -> tuple[str, str, int]:
-    """Helper function to run Docker container."""
-    # Container paths
-    container_temp_dir = "/tmp/r_work"
-    container_script_path = f"{container_temp_dir}/script.R"
+def execute_r_script_local(r_code: str, timeout: int = 60) -> tuple[str, str, int]:
+    """
+    Execute R script locally in the persistent R worker.
     
-    # Volume mapping
-    volumes = {host_temp_path: {"bind": container_temp_dir, "mode": "rw"}}
+    Returns:
+        Tuple of (stdout, stderr, return_code)
+    """
+    return R_WORKER.eval(r_code, timeout)
+
+async def run_rscript(r_code: str, timeout: int) -> subprocess.CompletedProcess:
+    """
+    Run R code in a fresh Rscript process without blocking the event loop.
     
-    # Run R script in container
+    Args:
+        r_code: R code to execute
+        timeout: Maximum execution time in seconds
+    
+    Raises:
+        subprocess.TimeoutExpired: If the script runs longer than timeout
+        FileNotFoundError: If Rscript is not installed
+    """
+    args = ["Rscript", "-e", r_code]
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
     try:
-        result = client.containers.run(
-            "r-base:latest",
-            f"Rscript {container_script_path}",
-            volumes=volumes,
-            working_dir=container_temp_dir,
-            remove=True,
-            stderr=True
-        )
-        return result.decode('utf-8') if isinstance(result, bytes) else str(result), "", 0
-        
-    except docker.errors.ContainerError as e:
-        stderr_output = e.stderr.decode('utf-8') if e.stderr else str(e)
-        return "", stderr_output, e.exit_status
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(args, timeout)
+    return subprocess.CompletedProcess(
+        args,
+        proc.returncode,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace")
+    )
 
-def execute_r_script_local(r_code: str, timeout: int = 60) -> tuple[str, str, int]:
+# Seconds to wait for a package repository to answer before giving up
+REPO_CHECK_TIMEOUT = 3
+
+def repo_reachable(repo: str) -> bool:
     """
-    Execute R script locally using subprocess.
+    Check that a package repository answers, with a HEAD request for its index.
     
-    Returns:
-        Tuple of (stdout, stderr, return_code)
+    Any HTTP response counts as reachable; only connection failures do not.
+    """
+    request = urllib.request.Request(f"{repo.rstrip('/')}/src/contrib/PACKAGES", method="HEAD")
+    try:
+        with urllib.request.urlopen(request, timeout=REPO_CHECK_TIMEOUT):
+            return True
+    except urllib.error.HTTPError:
+        return True
+    except (OSError, ValueError):
+        return False
+
+# Package installs are killed after INSTALL_IDLE_TIMEOUT seconds without any
+# output or INSTALL_TIMEOUT seconds in total. Only the last
+# INSTALL_OUTPUT_TAIL_LINES lines of their output are kept, and lines longer
+# than INSTALL_LINE_LIMIT bytes are skipped
+INSTALL_IDLE_TIMEOUT = 120
+INSTALL_TIMEOUT = 1800
+INSTALL_OUTPUT_TAIL_LINES = 200
+INSTALL_LINE_LIMIT = 1024 * 1024
+
+async def stream_rscript(
+    r_code: str,
+    timeout: int,
+    idle_timeout: int,
+    on_line: Callable[[str], Awaitable[None]] | None = None
+) -> subprocess.CompletedProcess:
     """
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.R', delete=False) as script_file:
-        script_file.write(r_code)
-        script_path = script_file.name
+    Run R code in a fresh Rscript process, reading its output as it arrives.
+    
+    stderr is merged into stdout. Each line is passed to on_line, and only the
+    last INSTALL_OUTPUT_TAIL_LINES lines are returned as stdout.
+    
+    Args:
+        r_code: R code to execute
+        timeout: Maximum execution time in seconds
+        idle_timeout: Maximum number of seconds to wait for the next line
+        on_line: Coroutine function called with every output line
     
+    Raises:
+        subprocess.TimeoutExpired: If the script runs longer than timeout, or
+            produces no output for idle_timeout seconds; its timeout attribute
+            tells which
+        FileNotFoundError: If Rscript is not installed
+    """
+    args = ["Rscript", "-e", r_code]
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        limit=INSTALL_LINE_LIMIT
+    )
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    lines = collections.deque(maxlen=INSTALL_OUTPUT_TAIL_LINES)
+    skipping = False
     try:
-        result = subprocess.run(
-            ["Rscript", script_path],
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
-        return result.stdout, result.stderr, result.returncode
-        
-    except subprocess.TimeoutExpired:
-        return "", f"Script execution timed out after {timeout} seconds", -1
-    except FileNotFoundError:
-        return "", "R is not installed or not in PATH. Please install R and ensure 'Rscript' is available.", -1
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(args, timeout)
+            try:
+                raw = await asyncio.wait_for(proc.stdout.readline(), min(idle_timeout, remaining))
+            except TimeoutError:
+                raise subprocess.TimeoutExpired(args, idle_timeout if remaining > idle_timeout else timeout)
+            except ValueError:
+                # Over INSTALL_LINE_LIMIT; the reader has already discarded
+                # the buffered part, so note the skip once per long line
+                if skipping:
+                    continue
+                skipping = True
+                raw = b"[long output line skipped]\n"
+            else:
+                skipping = False
+            if not raw:
+                break
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            lines.append(line)
+            if on_line is not None:
+                await on_line(line)
+        await proc.wait()
     finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    return subprocess.CompletedProcess(args, proc.returncode, "\n".join(lines), "")
+
+# R script templates for render_ggplot and execute_r_script. The workspace
+# blocks are only inserted when r_workspace holds files, so trivial scripts
+# skip listing the directory.
+GGPLOT_SCRIPT_TEMPLATE = '''
+# Load required libraries
+library(ggplot2)
+library(cowplot)
+
+# Set working directory based on mounted path
+base_dir <- "{base_dir}"
+setwd(base_dir)
+workspace_dir <- "{workspace_dir}"
+
+{workspace_block}# Set output parameters
+width <- {width}
+height <- {height}
+dpi <- {resolution}
+output_file <- "{output_file}"
+pdf(NULL)
+
+# Forget any plot left over from an earlier request in the same R session
+ggplot2::set_last_plot(NULL)
+
+# Execute the provided code
+{code}
+
+# Save the last plot
+ggsave(output_file, width = width/dpi, height = height/dpi, dpi = dpi)
+'''
+
+R_WORKSPACE_LISTING = '''if (dir.exists(workspace_dir)) {
+  workspace_files <- setdiff(list.files(workspace_dir, full.names = TRUE), file.path(workspace_dir, "renders"))
+  if (length(workspace_files) > 0) {
+    cat("Found uploaded files:", paste(basename(workspace_files), collapse=", "), "\\n")
+  }
+}
+
+'''
+
+R_SCRIPT_TEMPLATE = """
+# Smart file handling setup
+base_dir <- "{base_dir}"
+setwd(base_dir)
+workspace_dir <- "{workspace_dir}"
+
+{workspace_block}# Original user code
+{code}
+"""
+
+R_WORKSPACE_HELPERS = """if (dir.exists(workspace_dir)) {
+  # List available uploaded files
+  workspace_files <- setdiff(list.files(workspace_dir, full.names = FALSE), "renders")
+  if (length(workspace_files) > 0) {
+    cat("📁 Available uploaded files:", paste(workspace_files, collapse=", "), "\\n")
+    
+    # Helper function to read files from workspace
+    read_workspace_file <- function(filename) {
+      file_path <- file.path(workspace_dir, filename)
+      if (file.exists(file_path)) {
+        return(file_path)
+      } else {
+        # Try to find similar files
+        similar_files <- workspace_files[grepl(gsub("\\\\..*", "", filename), workspace_files, ignore.case = TRUE)]
+        if (length(similar_files) > 0) {
+          cat("⚠️ File '", filename, "' not found, but similar files available: ", paste(similar_files, collapse=", "), "\\n")
+          return(file.path(workspace_dir, similar_files[1]))
+        }
+        return(NULL)
+      }
+    }
+  }
+}
+
+"""
+
+def _workspace_has_files(workspace_dir: str) -> bool:
+    """Check whether the r_workspace directory exists and has any entries besides RENDERS_DIR."""
+    try:
+        with os.scandir(workspace_dir) as entries:
+            return any(entry.name != RENDERS_DIR for entry in entries)
+    except OSError:
+        return False
+
+def _prune_renders(renders_dir: Path):
+    """Delete all but the newest RENDER_FILES_MAX files in the renders directory."""
+    try:
+        with os.scandir(renders_dir) as entries:
+            files = [(entry.stat().st_mtime_ns, entry.path) for entry in entries if entry.is_file()]
+    except OSError:
+        return
+    files.sort(reverse=True)
+    for _, path in files[RENDER_FILES_MAX:]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+# Most recently used render_ggplot results, keyed by _render_cache_key()
+RENDER_CACHE_MAX_ENTRIES = 64
+_RENDER_CACHE = collections.OrderedDict()
+
+def _render_cache_key(code: str, output_type: str, width: int, height: int, resolution: int, use_docker: bool) -> bytes:
+    """
+    Build the render cache key from the plot parameters.
+    
+    The key also covers the working directory and the names, sizes and
+    mtimes of the files in it and its r_workspace, so plots that read files
+    are re-rendered after uploads or after a data file is overwritten.
+    """
+    base_dir = get_working_directory_str()
+    key = hashlib.blake2b(digest_size=16)
+    key.update(f"{code}|{output_type}|{width}|{height}|{resolution}|{use_docker}|{base_dir}".encode())
+    for path in (base_dir, get_workspace_directory_str()):
+        stamps = []
         try:
-            os.unlink(script_path)
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        st = entry.stat()
+                        stamps.append((entry.name, st.st_size, st.st_mtime_ns))
         except OSError:
             pass
+        key.update(f"|{sorted(stamps)}".encode())
+    return key.digest()
 
 @mcp.tool
-def render_ggplot(
+async def render_ggplot(
     code: str,
     output_type: OutputFormat = "png",
     width: int = 800,
@@ -613,7 +1245,9 @@ def render_ggplot(
         use_docker: Execute R code in Docker container for security
     
     Returns:
-        Dictionary containing the base64-encoded image and metadata
+        Dictionary containing the base64-encoded image and metadata. PDF and
+        SVG output is saved under r_workspace/renders of the mounted
+        directory instead, and its path is returned with type "file".
     """
     # Validate arguments
     if not code.strip():
@@ -628,54 +1262,58 @@ def render_ggplot(
     if resolution < 72 or resolution > 600:
         raise ValueError("Resolution must be between 72 and 600")
     
-    # Create temporary directory for R script and output
+    # Serve identical requests from the render cache
+    cache_key = _render_cache_key(code, output_type, width, height, resolution, use_docker)
+    cached = _RENDER_CACHE.get(cache_key)
+    if cached is not None and (cached["type"] != "file" or os.path.exists(cached["path"])):
+        _RENDER_CACHE.move_to_end(cache_key)
+        return dict(cached)
+    
+    # Vector outputs go straight to the mounted workspace instead of base64
+    render_path = None
+    if _WD_CACHE["workspace"] and output_type in FILE_OUTPUT_FORMATS:
+        render_path = Path(_WD_CACHE["workspace"]) / RENDERS_DIR / f"{uuid.uuid4().hex}.{output_type}"
+        render_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    # Create temporary directory for the output file
     with tempfile.TemporaryDirectory(prefix="ggplot-") as temp_dir:
-        script_path = Path(temp_dir) / "script.R"
-        output_path = Path(temp_dir) / f"output.{output_type}"
+        if use_docker:
+            # Paths as seen from inside the R container
+            output_name = f"{uuid.uuid4().hex}.{output_type}"
+            try:
+                output_path = _get_docker_scratch_dir() / output_name
+            except OSError as e:
+                raise RuntimeError(f"Docker execution failed: {str(e)}")
+            output_file = f"{DOCKER_WORK_DIR}/{DOCKER_SCRATCH_DIR}/{output_name}"
+            base_dir = DOCKER_WORK_DIR
+            workspace_dir = f"{DOCKER_WORK_DIR}/r_workspace"
+        else:
+            output_path = render_path or Path(temp_dir) / f"output.{output_type}"
+            output_file = str(output_path)
+            base_dir = get_working_directory_str()
+            workspace_dir = get_workspace_directory_str()
         
         # Generate R script content with smart file handling
-        r_script = f'''
-# Load required libraries
-library(ggplot2)
-library(cowplot)
-
-# Set working directory based on mounted path
-base_dir <- "{get_working_directory()}"
-setwd(base_dir)
-workspace_dir <- file.path(base_dir, "r_workspace")
-
-if (dir.exists(workspace_dir)) {{
-  workspace_files <- list.files(workspace_dir, full.names = TRUE)
-  if (length(workspace_files) > 0) {{
-    cat("Found uploaded files:", paste(basename(workspace_files), collapse=", "), "\\n")
-  }}
-}}
-
-# Set output parameters
-width <- {width}
-height <- {height}
-dpi <- {resolution}
-output_file <- "{output_path}"
-pdf(NULL)
-
-# Execute the provided code
-{code}
-
-# Save the last plot
-ggsave(output_file, width = width/dpi, height = height/dpi, dpi = dpi)
-'''
-        
-        # Write R script to file
-        script_path.write_text(r_script)
+        workspace_block = R_WORKSPACE_LISTING if _workspace_has_files(get_workspace_directory_str()) else ""
+        r_script = GGPLOT_SCRIPT_TEMPLATE.format(
+            base_dir=base_dir,
+            workspace_dir=workspace_dir,
+            workspace_block=workspace_block,
+            width=width,
+            height=height,
+            resolution=resolution,
+            output_file=output_file,
+            code=code
+        )
         
         try:
             # Execute R script (Docker or local)
             if use_docker:
-                stdout, stderr, returncode = execute_r_script_docker(r_script, str(temp_dir))
+                stdout, stderr, returncode = await asyncio.to_thread(execute_r_script_docker, r_script, 60)
                 if returncode != 0:
                     raise RuntimeError(f"R script execution failed: {stderr}")
             else:
-                stdout, stderr, returncode = execute_r_script_local(r_script, timeout=60)
+                stdout, stderr, returncode = await asyncio.to_thread(execute_r_script_local, r_script, 60)
                 if returncode != 0:
                     raise RuntimeError(f"R script execution failed: {stderr}")
             
@@ -683,10 +1321,6 @@ ggsave(output_file, width = width/dpi, height = height/dpi, dpi = dpi)
             if not output_path.exists():
                 raise RuntimeError("Output file was not created")
             
-            # Read and encode the image
-            image_data = output_path.read_bytes()
-            base64_data = base64.b64encode(image_data).decode('utf-8')
-            
             # Determine MIME type
             mime_types = {
                 "png": "image/png",
@@ -695,24 +1329,59 @@ ggsave(output_file, width = width/dpi, height = height/dpi, dpi = dpi)
                 "svg": "image/svg+xml"
             }
             
-            # Return structured image data
-            return {
-                "type": "image",
-                "format": output_type,
-                "data": base64_data,
-                "mime_type": mime_types[output_type],
-                "width": width,
-                "height": height,
-                "resolution": resolution
-            }
+            if render_path:
+                if output_path != render_path:
+                    shutil.move(output_path, render_path)
+                _prune_renders(render_path.parent)
+                
+                # Return the location of the rendered file
+                result = {
+                    "type": "file",
+                    "format": output_type,
+                    "path": str(render_path),
+                    "mime_type": mime_types[output_type],
+                    "width": width,
+                    "height": height,
+                    "resolution": resolution
+                }
+            else:
+                # Encode the image straight from a memory map of the file
+                with open(output_path, "rb") as f:
+                    if os.fstat(f.fileno()).st_size:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                            base64_data = base64.b64encode(mm).decode('ascii')
+                    else:
+                        base64_data = ""
+                
+                # Return structured image data
+                result = {
+                    "type": "image",
+                    "format": output_type,
+                    "data": base64_data,
+                    "mime_type": mime_types[output_type],
+                    "width": width,
+                    "height": height,
+                    "resolution": resolution
+                }
+            
+            _RENDER_CACHE[cache_key] = dict(result)
+            if len(_RENDER_CACHE) > RENDER_CACHE_MAX_ENTRIES:
+                _, evicted = _RENDER_CACHE.popitem(last=False)
+                if evicted["type"] == "file":
+                    Path(evicted["path"]).unlink(missing_ok=True)
+            
+            return result
             
         except subprocess.TimeoutExpired:
             raise RuntimeError("R script execution timed out")
         except FileNotFoundError:
             raise RuntimeError("R is not installed or not in PATH. Please install R and ensure 'Rscript' is available.")
+        finally:
+            if use_docker:
+                output_path.unlink(missing_ok=True)
 
 @mcp.tool
-def execute_r_script(
+async def execute_r_script(
     code: str,
     timeout: int = 60,
     use_docker: bool = False
@@ -736,46 +1405,28 @@ def execute_r_script(
         raise ValueError("Timeout must be between 1 and 300 seconds")
     
     try:
-        # Enhanced R script with smart file handling
-        enhanced_code = f"""
-# Smart file handling setup
-base_dir <- "{get_working_directory()}"
-setwd(base_dir)
-workspace_dir <- file.path(base_dir, "r_workspace")
-
-if (dir.exists(workspace_dir)) {{
-  # List available uploaded files
-  workspace_files <- list.files(workspace_dir, full.names = FALSE)
-  if (length(workspace_files) > 0) {{
-    cat("📁 Available uploaded files:", paste(workspace_files, collapse=", "), "\\n")
-    
-    # Helper function to read files from workspace
-    read_workspace_file <- function(filename) {{
-      file_path <- file.path(workspace_dir, filename)
-      if (file.exists(file_path)) {{
-        return(file_path)
-      }} else {{
-        # Try to find similar files
-        similar_files <- workspace_files[grepl(gsub("\\\\..*", "", filename), workspace_files, ignore.case = TRUE)]
-        if (length(similar_files) > 0) {{
-          cat("⚠️ File '", filename, "' not found, but similar files available: ", paste(similar_files, collapse=", "), "\\n")
-          return(file.path(workspace_dir, similar_files[1]))
-        }}
-        return(NULL)
-      }}
-    }}
-  }}
-}}
-
-# Original user code
-{code}
-"""
+        if use_docker:
+            base_dir = DOCKER_WORK_DIR
+            workspace_dir = f"{DOCKER_WORK_DIR}/r_workspace"
+        else:
+            base_dir = get_working_directory_str()
+            workspace_dir = get_workspace_directory_str()
+        
+        # Enhanced R script with smart file handling; the workspace helpers
+        # are only added when there are uploaded files to help with
+        workspace_block = R_WORKSPACE_HELPERS if _workspace_has_files(get_workspace_directory_str()) else ""
+        enhanced_code = R_SCRIPT_TEMPLATE.format(
+            base_dir=base_dir,
+            workspace_dir=workspace_dir,
+            workspace_block=workspace_block,
+            code=code
+        )
         
         # Execute R script (Docker or local)
         if use_docker:
-            stdout, stderr, returncode = execute_r_script_docker(enhanced_code)
+            stdout, stderr, returncode = await asyncio.to_thread(execute_r_script_docker, enhanced_code, timeout)
         else:
-            stdout, stderr, returncode = execute_r_script_local(enhanced_code, timeout)
+            stdout, stderr, returncode = await asyncio.to_thread(execute_r_script_local, enhanced_code, timeout)
         
         # Return structured data
         return {
@@ -796,15 +1447,19 @@ if (dir.exists(workspace_dir)) {{
         }
 
 @mcp.tool
-def install_r_package(
+async def install_r_package(
     package_name: str,
     version: str = "",
     repo: str = "https://cran.r-project.org",
-    force_reinstall: bool = False
+    force_reinstall: bool = False,
+    ctx: Context | None = None
 ) -> dict:
     """
     Install an R package.
     
+    Installer output is forwarded to the client as log messages while the
+    installation runs.
+    
     Args:
         package_name: Name of the R package to install
         version: Specific version to install (optional, e.g., "1.0.0")
@@ -826,89 +1481,94 @@ def install_r_package(
     print(f"Processing R package installation: {package_name}", file=sys.stderr)
     
     try:
-        # First check if package already exists (unless force reinstall)
+        # Check for an existing installation in the running worker rather
+        # than in a fresh R process
         if not force_reinstall:
             check_script = f"""
             if (requireNamespace("{package_name}", quietly = TRUE)) {{
-              cat("ALREADY_INSTALLED\\n")
-              cat("Version:", as.character(packageVersion("{package_name}")), "\\n")
-            }} else {{
-              cat("NOT_INSTALLED\\n")
+              cat(as.character(packageVersion("{package_name}")))
             }}
             """
-            
-            check_result = subprocess.run(
-                ["Rscript", "-e", check_script],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if "ALREADY_INSTALLED" in check_result.stdout:
-                installed_version = ""
-                if "Version:" in check_result.stdout:
-                    installed_version = check_result.stdout.split("Version:")[1].strip()
-                
+            stdout, _, returncode = await asyncio.to_thread(R_WORKER.eval, check_script, 15)
+            if returncode == 0 and stdout.strip():
                 return {
                     "success": True,
                     "package": package_name,
-                    "message": f"Package already installed",
-                    "version": installed_version,
+                    "message": "Package already installed",
+                    "version": stdout.strip(),
                     "details": "No installation needed"
                 }
         
-        # Prepare installation script
+        # Fail fast when offline instead of waiting on R's download timeout
+        if not await asyncio.to_thread(repo_reachable, repo):
+            return {
+                "success": False,
+                "package": package_name,
+                "message": "Repository unreachable",
+                "details": f"Could not connect to {repo}; check the repository URL and internet connection"
+            }
+        
+        # Prepare installation step
         if version:
             # Install specific version
-            install_script = f"""
-            # Try to install specific version
-            tryCatch({{
+            install_step = f"""
               if (!requireNamespace("devtools", quietly = TRUE)) {{
                 install.packages("devtools", repos="{repo}", quiet=TRUE)
               }}
-              devtools::install_version("{package_name}", version = "{version}", repos = "{repo}", quiet = TRUE)
-              
-              if (requireNamespace("{package_name}", quietly = TRUE)) {{
-                cat("SUCCESS\\n")
-                cat("Version:", as.character(packageVersion("{package_name}")), "\\n")
-              }} else {{
-                cat("FAILED\\n")
-              }}
-            }}, error = function(e) {{
-              cat("ERROR:", conditionMessage(e), "\\n")
-            }})
+              devtools::install_version("{package_name}", version = "{version}", repos = "{repo}")
             """
         else:
             # Install latest version
-            install_script = f"""
-            tryCatch({{
-              install.packages("{package_name}", repos="{repo}", quiet=TRUE)
-              
-              if (requireNamespace("{package_name}", quietly = TRUE)) {{
-                cat("SUCCESS\\n")
-                cat("Version:", as.character(packageVersion("{package_name}")), "\\n")
-              }} else {{
-                cat("FAILED\\n")
-              }}
-            }}, error = function(e) {{
-              cat("ERROR:", conditionMessage(e), "\\n")
-            }})
+            install_step = f"""
+              install.packages("{package_name}", repos="{repo}")
             """
         
-        # Execute installation
-        install_result = subprocess.run(
-            ["Rscript", "-e", install_script],
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minutes timeout for installation
+        # Install and report the outcome as a final JSON line
+        install_script = f"""
+        result <- tryCatch({{
+          {install_step}
+          # Verify against the library that was just written to, without loading the namespace
+          installed <- installed.packages(lib.loc = .libPaths()[1])
+          if ("{package_name}" %in% rownames(installed)) {{
+            list(status = "installed", version = installed["{package_name}", "Version"])
+          }} else {{
+            list(status = "failed")
+          }}
+        }}, error = function(e) {{
+          list(status = "error", message = conditionMessage(e))
+        }})
+        cat("\\n", jsonlite::toJSON(result, auto_unbox = TRUE), "\\n", sep = "")
+        """
+        
+        # Execute installation, streaming its progress; a stalled download
+        # or build is killed after INSTALL_IDLE_TIMEOUT seconds of silence.
+        # Rscript starts like R_WORKER, so both see the same library paths
+        install_result = await stream_rscript(
+            install_script,
+            timeout=INSTALL_TIMEOUT,
+            idle_timeout=INSTALL_IDLE_TIMEOUT,
+            on_line=ctx.info if ctx is not None else None
         )
         
-        if "SUCCESS" in install_result.stdout:
-            installed_version = ""
-            if "Version:" in install_result.stdout:
-                installed_version = install_result.stdout.split("Version:")[1].strip()
+        # The outcome is the last JSON line; deferred R warnings may follow it
+        outcome = {}
+        for line in reversed(install_result.stdout.splitlines()):
+            if line.startswith("{"):
+                try:
+                    outcome = json.loads(line)
+                    break
+                except ValueError:
+                    pass
+        status = outcome.get("status")
+        status_detail = outcome.get("version") or outcome.get("message", "")
+        
+        if status == "installed":
+            installed_version = status_detail
             
             print(f"✓ Successfully installed R package: {package_name}", file=sys.stderr)
+            _invalidate_package_cache()
+            # The worker may still have the old version loaded
+            await asyncio.to_thread(R_WORKER.reset)
             return {
                 "success": True,
                 "package": package_name,
@@ -916,27 +1576,30 @@ def install_r_package(
                 "version": installed_version,
                 "details": install_result.stdout
             }
-        elif "ERROR:" in install_result.stdout:
-            error_msg = install_result.stdout.split("ERROR:")[1].strip()
+        elif status == "error":
             return {
                 "success": False,
                 "package": package_name,
-                "message": f"Installation failed: {error_msg}",
-                "details": install_result.stderr
+                "message": f"Installation failed: {status_detail}",
+                "details": install_result.stdout
             }
         else:
             return {
                 "success": False,
                 "package": package_name,
                 "message": "Installation failed for unknown reason",
-                "details": f"stdout: {install_result.stdout}, stderr: {install_result.stderr}"
+                "details": install_result.stdout
             }
             
-    except subprocess.TimeoutExpired:
+    except subprocess.TimeoutExpired as e:
+        if e.timeout == INSTALL_IDLE_TIMEOUT:
+            message = f"Installation stalled (no output for {INSTALL_IDLE_TIMEOUT} seconds)"
+        else:
+            message = f"Installation timed out ({INSTALL_TIMEOUT // 60} minutes)"
         return {
             "success": False,
             "package": package_name,
-            "message": "Installation timed out (5 minutes)",
+            "message": message,
             "details": "Consider installing manually or checking internet connection"
         }
     except Exception as e:
@@ -948,53 +1611,338 @@ def install_r_package(
         }
 
 @mcp.tool
-def list_r_packages(
+async def install_r_packages(
+    package_names: list[str],
+    repo: str = "https://cran.r-project.org",
+    force_reinstall: bool = False
+) -> dict:
+    """
+    Install several R packages in one R session.
+    
+    Missing packages are passed to a single install.packages() call that
+    downloads and builds them in parallel.
+    
+    Args:
+        package_names: Names of the R packages to install
+        repo: Repository URL (default: CRAN)
+        force_reinstall: Reinstall packages that already exist
+    
+    Returns:
+        Dictionary with the installation status of each package
+    """
+    package_names = list(dict.fromkeys(package_names))
+    
+    # Validate package names (basic security check)
+    invalid = [p for p in package_names if not p or not p.replace(".", "").replace("_", "").isalnum()]
+    if not package_names or invalid:
+        return {
+            "success": False,
+            "packages": [],
+            "message": "Invalid package name. Only alphanumeric characters, dots, and underscores allowed.",
+            "details": f"Invalid: {', '.join(invalid)}" if invalid else "No packages given"
+        }
+    
+    print(f"Processing R package installation: {', '.join(package_names)}", file=sys.stderr)
+    
+    force = "TRUE" if force_reinstall else "FALSE"
+    install_script = f"""
+    pkgs <- {r_vector(package_names)}
+    # Install time of each package, from the mtime of its DESCRIPTION file
+    install_times <- function(installed) {{
+      setNames(file.mtime(file.path(installed[, "LibPath"], installed[, "Package"], "DESCRIPTION")),
+               installed[, "Package"])
+    }}
+    before <- install_times(installed.packages())
+    todo <- if ({force}) pkgs else setdiff(pkgs, names(before))
+    if (length(todo) > 0) {{
+      tryCatch(
+        install.packages(todo, repos = "{repo}", quiet = TRUE, Ncpus = parallel::detectCores()),
+        error = function(e) cat("ERROR:", conditionMessage(e), "\\n", file = stderr())
+      )
+    }}
+    
+    # One row per package, marked with ROW: name, status, version. A package
+    # in todo only counts as installed when its copy is new, so a failed
+    # reinstall that left the old copy in place is reported as failed
+    installed <- installed.packages(noCache = TRUE)
+    after <- install_times(installed)
+    for (p in pkgs) {{
+      updated <- p %in% names(after) && (!p %in% names(before) || after[[p]] > before[[p]])
+      status <- if (!p %in% rownames(installed)) "failed" else if (!p %in% todo) "already" else if (updated) "installed" else "failed"
+      version <- if (p %in% rownames(installed)) installed[p, "Version"] else ""
+      cat("ROW:", p, status, version, sep = "\\t")
+      cat("\\n")
+    }}
+    """
+    
+    try:
+        # Only contact the repository when something actually needs installing
+        if force_reinstall:
+            missing = package_names
+        else:
+            states = await asyncio.to_thread(check_r_packages, package_names)
+            missing = [p for p in package_names if states.get(p) != "OK"]
+        if missing and not await asyncio.to_thread(repo_reachable, repo):
+            return {
+                "success": False,
+                "packages": [],
+                "message": "Repository unreachable",
+                "details": f"Could not connect to {repo}; check the repository URL and internet connection"
+            }
+        
+        timeout = max(300, 120 * len(package_names))
+        # Rscript starts like R_WORKER, so both see the same library paths
+        install_result = await run_rscript(install_script, timeout=timeout)
+        
+        # Only marked rows count; anything else on stdout is installer output
+        packages = [
+            {"package": row[1], "status": row[2], "version": row[3]}
+            for row in csv.reader(io.StringIO(install_result.stdout), delimiter="\t", quoting=csv.QUOTE_NONE)
+            if len(row) == 4 and row[0] == "ROW:"
+        ]
+        failed = [p["package"] for p in packages if p["status"] == "failed"]
+        
+        if any(p["status"] == "installed" for p in packages):
+            _invalidate_package_cache()
+            # The worker may still have the old versions loaded
+            await asyncio.to_thread(R_WORKER.reset)
+        
+        if packages and not failed:
+            print(f"✓ R packages ready: {', '.join(package_names)}", file=sys.stderr)
+            return {
+                "success": True,
+                "packages": packages,
+                "message": "All packages installed",
+                "details": install_result.stderr
+            }
+        return {
+            "success": False,
+            "packages": packages,
+            "message": f"Installation failed for: {', '.join(failed) or 'all packages'}",
+            "details": f"stdout: {install_result.stdout}, stderr: {install_result.stderr}"
+        }
+        
+    except subprocess.TimeoutExpired:
+        return {
+            "success": False,
+            "packages": [],
+            "message": f"Installation timed out ({timeout // 60} minutes)",
+            "details": "Consider installing manually or checking internet connection"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "packages": [],
+            "message": f"Unexpected error: {str(e)}",
+            "details": ""
+        }
+
+# Installed R packages (name, version, title), reused for _PKG_CACHE_TTL
+# seconds and then for as long as the R installation ("env") is the same and
+# the mtimes of the R library directories and of each package's DESCRIPTION
+# file ("stamps") are unchanged. The list is persisted to PKG_CACHE_FILE so
+# that a restarted server can reuse it without running R.
+_PKG_CACHE_TTL = 300
+PKG_CACHE_FILE = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "rlang-mcp" / "installed.json"
+_pkg_cache = {"ts": 0.0, "rows": [], "stamps": {}, "env": ""}
+
+def _r_environment() -> str:
+    """Describe the R installation and library settings that decide .libPaths()."""
+    rscript = shutil.which("Rscript")
+    try:
+        rscript_mtime = os.stat(os.path.realpath(rscript)).st_mtime_ns if rscript else 0
+    except OSError:
+        rscript_mtime = 0
+    lib_vars = {name: os.environ.get(name, "") for name in ("R_HOME", "R_LIBS", "R_LIBS_USER", "R_LIBS_SITE")}
+    return json.dumps([rscript, rscript_mtime, lib_vars])
+
+def _read_package_cache():
+    """Load the persisted package list into _pkg_cache, if there is one."""
+    try:
+        data = json.loads(PKG_CACHE_FILE.read_text(encoding="utf-8"))
+        _pkg_cache["rows"] = data["rows"]
+        _pkg_cache["stamps"] = data["stamps"]
+        _pkg_cache["env"] = data["env"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+def _write_package_cache():
+    """Persist _pkg_cache atomically; failures only cost a rescan later."""
+    try:
+        PKG_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = PKG_CACHE_FILE.with_name(f"{PKG_CACHE_FILE.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps({"rows": _pkg_cache["rows"], "stamps": _pkg_cache["stamps"], "env": _pkg_cache["env"]}),
+            encoding="utf-8"
+        )
+        os.replace(tmp_path, PKG_CACHE_FILE)
+    except OSError:
+        pass
+
+def _stamps_unchanged(stamps: dict) -> bool:
+    """Check that every recorded library directory and DESCRIPTION file still has its recorded mtime."""
+    if not stamps:
+        return False
+    for path, mtime_ns in stamps.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return True
+
+def _invalidate_package_cache():
+    """Force the next package listing to rescan the R libraries."""
+    _pkg_cache["ts"] = 0.0
+    _pkg_cache["stamps"] = {}
+
+_read_package_cache()
+
+async def _load_installed_packages(force: bool = False) -> list[dict]:
+    """Get the installed R packages, rescanning the R libraries when the cache is stale."""
+    env = _r_environment()
+    if not force and _pkg_cache["env"] == env:
+        if time.time() - _pkg_cache["ts"] < _PKG_CACHE_TTL:
+            return _pkg_cache["rows"]
+        if _stamps_unchanged(_pkg_cache["stamps"]):
+            _pkg_cache["ts"] = time.time()
+            return _pkg_cache["rows"]
+    
+    # A COUNT:<n> header and the library paths (marked with "#") are printed;
+    # the package table goes to a file so that it does not pass through the
+    # worker's captured output
+    with tempfile.TemporaryDirectory(prefix="rpkgs-") as temp_dir:
+        table_path = Path(temp_dir) / "installed.tsv"
+        list_script = f"""
+        installed <- installed.packages(fields = "Title")[, c("Package", "LibPath", "Version", "Title"), drop = FALSE]
+        cat("COUNT:", nrow(installed), "\\n", sep = "")
+        cat(paste0("#", .libPaths(), "\\n"), sep = "")
+        installed[, "Title"] <- gsub("\\\\s+", " ", installed[, "Title"])
+        write.table(installed, file = "{table_path}",
+                    sep = "\\t", quote = FALSE, row.names = FALSE, col.names = FALSE,
+                    na = "", fileEncoding = "UTF-8")
+        """
+        stdout, stderr, returncode = await asyncio.to_thread(R_WORKER.eval, list_script, 30)
+        if returncode != 0:
+            raise RuntimeError(stderr.strip() or "Could not list installed packages")
+        
+        header, _, lib_lines = stdout.partition("\n")
+        if not header.startswith("COUNT:"):
+            raise RuntimeError(stderr.strip() or "Could not list installed packages")
+        count = int(header.removeprefix("COUNT:"))
+        
+        stamps = {}
+        for line in lib_lines.splitlines():
+            if line.startswith("#"):
+                try:
+                    stamps[line[1:]] = os.stat(line[1:]).st_mtime_ns
+                except OSError:
+                    pass
+        
+        # In-place upgrades only touch the package's own directory, so each
+        # DESCRIPTION file is stamped as well
+        rows = []
+        if count > 0:
+            with open(table_path, newline="", encoding="utf-8") as f:
+                for name, lib_path, version, title in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                    rows.append({"name": name, "version": version, "title": title})
+                    description = os.path.join(lib_path, name, "DESCRIPTION")
+                    try:
+                        stamps[description] = os.stat(description).st_mtime_ns
+                    except OSError:
+                        pass
+    
+    _pkg_cache["rows"] = rows
+    _pkg_cache["stamps"] = stamps
+    _pkg_cache["env"] = env
+    _pkg_cache["ts"] = time.time()
+    _write_package_cache()
+    return rows
+
+# Packages available from CRAN, refreshed at most once per
+# _AVAILABLE_CACHE_MAX_AGE seconds; the file's mtime records the last fetch
+_AVAILABLE_CACHE_MAX_AGE = 3600
+AVAILABLE_CACHE_FILE = PKG_CACHE_FILE.with_name("available.tsv")
+
+async def _load_available_packages(force: bool = False) -> list[dict]:
+    """Get the packages available from CRAN, downloading the index only when the cache is old."""
+    text = None
+    if not force:
+        try:
+            if time.time() - AVAILABLE_CACHE_FILE.stat().st_mtime < _AVAILABLE_CACHE_MAX_AGE:
+                text = AVAILABLE_CACHE_FILE.read_text(encoding="utf-8")
+        except OSError:
+            pass
+    
+    if text is None:
+        list_script = """
+        available <- available.packages(repos = "https://cran.r-project.org",
+                                        filters = c("R_version", "OS_type", "duplicates"))
+        write.table(available[, c("Package", "Version"), drop = FALSE], sep = "\\t",
+                    quote = FALSE, row.names = FALSE, col.names = FALSE, na = "")
+        """
+        result = await run_rscript(list_script, timeout=60)
+        # An unreachable repository only gives a warning and no rows, which
+        # must not be cached
+        if result.returncode != 0 or not result.stdout.strip():
+            raise RuntimeError(result.stderr.strip() or "Could not list available packages")
+        text = result.stdout
+        try:
+            AVAILABLE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = AVAILABLE_CACHE_FILE.with_name(f"{AVAILABLE_CACHE_FILE.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, AVAILABLE_CACHE_FILE)
+        except OSError:
+            pass
+    
+    return [
+        {"name": name, "version": version}
+        for name, version in csv.reader(io.StringIO(text), delimiter="\t", quoting=csv.QUOTE_NONE)
+    ]
+
+@mcp.tool
+async def list_r_packages(
     installed_only: bool = True,
-    pattern: str = ""
+    pattern: str = "",
+    force: bool = False
 ) -> dict:
     """
     List R packages.
     
     Args:
         installed_only: Only show installed packages (default: True)
-        pattern: Filter packages by name pattern (optional)
+        pattern: Filter packages by name pattern (optional; without it only
+            the number of available packages is returned)
+        force: Rescan the R libraries (or re-download the CRAN index) instead of using the cached list
     
     Returns:
         Dictionary with package list and details
     """
     try:
         if installed_only:
-            list_script = f"""
-            installed <- as.data.frame(installed.packages())
-            if ("{pattern}" != "") {{
-              installed <- installed[grepl("{pattern}", installed$Package, ignore.case=TRUE), ]
-            }}
-            
-            if (nrow(installed) > 0) {{
-              for(i in 1:nrow(installed)) {{
-                cat("PACKAGE:", installed$Package[i], "\\n")
-                cat("VERSION:", installed$Version[i], "\\n")
-                cat("TITLE:", installed$Title[i], "\\n")
-                cat("---\\n")
-              }}
-            }} else {{
-              cat("NO_PACKAGES\\n")
-            }}
-            """
+            rows = await _load_installed_packages(force)
         else:
-            list_script = """
-            available <- available.packages()
-            cat("AVAILABLE_PACKAGES:", nrow(available), "\\n")
-            """
+            rows = await _load_available_packages(force)
+            # The full CRAN list is far too long to return unfiltered
+            if not pattern:
+                return {
+                    "success": True,
+                    "packages": [],
+                    "count": len(rows),
+                    "message": f"{len(rows)} packages available; pass a pattern to list them"
+                }
         
-        result = subprocess.run(
-            ["Rscript", "-e", list_script],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
+        if pattern and _REGEX_META_RE.search(pattern):
+            matches = re.compile(pattern, re.IGNORECASE).search
+            packages = [row for row in rows if matches(row["name"])]
+        elif pattern:
+            # Plain text: a substring test is enough, no regex needed
+            needle = pattern.lower()
+            packages = [row for row in rows if needle in row["name"].lower()]
+        else:
+            packages = list(rows)
         
-        if "NO_PACKAGES" in result.stdout:
+        if not packages:
             return {
                 "success": True,
                 "packages": [],
@@ -1002,24 +1950,6 @@ def list_r_packages(
                 "message": "No packages found matching criteria"
             }
         
-        # Parse package information
-        packages = []
-        if "PACKAGE:" in result.stdout:
-            lines = result.stdout.split("---")
-            for chunk in lines:
-                if "PACKAGE:" in chunk:
-                    package_info = {}
-                    for line in chunk.strip().split("\\n"):
-                        if "PACKAGE:" in line:
-                            package_info["name"] = line.split("PACKAGE:")[1].strip()
-                        elif "VERSION:" in line:
-                            package_info["version"] = line.split("VERSION:")[1].strip()
-                        elif "TITLE:" in line:
-                            package_info["title"] = line.split("TITLE:")[1].strip()
-                    
-                    if package_info.get("name"):
-                        packages.append(package_info)
-        
         return {
             "success": True,
             "packages": packages,